@@ -1,45 +1,113 @@
 # auth_utils.py
-from datetime import datetime, timedelta
-from typing import Optional
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Optional
 
-from jose import JWTError, jwt
+from cachetools import TTLCache
+import jwt
+from jwt import InvalidTokenError as JWTError
 from passlib.context import CryptContext
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-import asyncpg
+from psycopg import AsyncConnection
 
-from app import schemas, crud
-from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app import crud
+from app.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, USER_CACHE_ENABLED
 from app.database import get_db_connection
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def verify_password(plain_password, hashed_password):
+# Verified token -> (user, exp) cache, keyed by SHA-256 of the raw token.
+# Role changes evict through invalidate_cached_user, and entries never outlive the token's exp
+TOKEN_CACHE_TTL_SECONDS = 300
+_token_cache = TTLCache(maxsize=10000, ttl=TOKEN_CACHE_TTL_SECONDS)
+class _TokenLock:
+    """Lock for one token digest, counting the requests holding or waiting on it"""
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+# One in-flight lookup per token digest, so a burst of requests with a fresh token costs one query
+_token_locks: Dict[str, _TokenLock] = {}
+
+# bcrypt is CPU-bound (tens to hundreds of ms), keep it off the event loop. The bcrypt
+# backend releases the GIL, so one bounded thread pool shared by hash and verify is enough
+HASH_POOL = ThreadPoolExecutor(max_workers=max(2, os.cpu_count() or 1))
+
+async def verify_password(plain_password, hashed_password):
     """Verify a plain password against a hashed password"""
-    return pwd_context.verify(plain_password, hashed_password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(HASH_POOL, pwd_context.verify, plain_password, hashed_password)
 
-def get_password_hash(password):
+async def get_password_hash(password):
     """Hash a password"""
-    return pwd_context.hash(password)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(HASH_POOL, pwd_context.hash, password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
     to_encode = data.copy()
+    # JWT exp is a NumericDate (integer epoch seconds), so skip the datetime round-trip
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = int(time.time()) + int(expires_delta.total_seconds())
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+        expire = int(time.time()) + ACCESS_TOKEN_EXPIRE_MINUTES * 60
+    to_encode["exp"] = expire
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 async def get_current_user(
     token: str = Depends(oauth2_scheme), 
-    conn: asyncpg.Connection = Depends(get_db_connection)
+    conn: AsyncConnection = Depends(get_db_connection)
 ) -> dict:
     """Get current user from JWT token"""
+    # Never keep raw tokens in memory, only their digest
+    key = hashlib.sha256(token.encode()).hexdigest()
+    user = _get_cached_user(key)
+    if user is not None:
+        return user
+
+    # No await between lookup and refcount bump, so this is race-free on the event loop
+    entry = _token_locks.get(key)
+    if entry is None:
+        entry = _token_locks[key] = _TokenLock()
+    entry.users += 1
+    try:
+        async with entry.lock:
+            # Another request may have resolved this token while we waited
+            user = _get_cached_user(key)
+            if user is None:
+                user = await _load_user(token, key, conn)
+            return user
+    finally:
+        entry.users -= 1
+        # Drop the entry once nobody holds or waits on it (and only if it's still ours)
+        if entry.users == 0 and _token_locks.get(key) is entry:
+            del _token_locks[key]
+
+def _get_cached_user(key: str) -> Optional[dict]:
+    if not USER_CACHE_ENABLED:
+        return None
+    cached = _token_cache.get(key)
+    if cached is None:
+        return None
+    user, exp = cached
+    # The cache TTL may outlive the token itself
+    if exp > time.time():
+        return user
+    _token_cache.pop(key, None)
+    return None
+
+async def _load_user(token: str, key: str, conn: AsyncConnection) -> dict:
+    """Verify the token and fetch its user, caching the result until the token expires"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,22 +115,31 @@ async def get_current_user(
     )
     
     try:
-        # Decode JWT token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+        # Decode JWT token; tokens without exp or sub are rejected by the decoder itself
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM], options={"require": ["exp", "sub"]})
+        username = payload["sub"]
+        if not isinstance(username, str):
             raise credentials_exception
-        token_data = schemas.TokenData(username=username)
     except JWTError:
         raise credentials_exception
     
     # Get user from database
-    user = await crud.get_user_by_username(conn, username=token_data.username)
+    user = await crud.get_user_by_username(conn, username=username)
     if user is None:
         raise credentials_exception
+
+    exp = payload["exp"]
+    if USER_CACHE_ENABLED and exp - time.time() > 0:
+        _token_cache[key] = (user, exp)
     
     return user  # Returns dict instead of model
 
+def invalidate_cached_user(user_id: int):
+    """Drop cached token lookups for a user, e.g. after a role change"""
+    for key, (user, _) in list(_token_cache.items()):
+        if user["id"] == user_id:
+            _token_cache.pop(key, None)
+
 async def get_current_active_user(
     current_user: dict = Depends(get_current_user)
 ) -> dict:
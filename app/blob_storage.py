@@ -1,93 +1,190 @@
 # blob_storage.py
+import base64
+import hashlib
+import hmac
+import mimetypes
 import os
+from typing import AsyncIterator, List, Optional
+from urllib.parse import quote, unquote, urlparse
+import aiohttp
+from azure.core.exceptions import ResourceExistsError
+from azure.core.pipeline.transport import AioHttpTransport
+from azure.storage.blob import ContentSettings
 from azure.storage.blob.aio import BlobServiceClient, BlobClient, ContainerClient
-from fastapi import UploadFile
-import uuid
-from datetime import datetime, timedelta
-from azure.storage.blob import generate_blob_sas, BlobSasPermissions
+from fastapi import HTTPException, UploadFile, status
+import secrets
+from datetime import datetime, timedelta, timezone
+from cachetools import TTLCache
 
 from app.config import(
     AZURE_STORAGE_ACCOUNT_NAME,
     AZURE_STORAGE_ACCOUNT_KEY,
     AZURE_STORAGE_CONNECTION_STRING,
-    AZURE_BLOB_CONTAINER_NAME
+    AZURE_BLOB_CONTAINER_NAME,
+    BLOB_CHUNK_SIZE
 )
 
-# Initialize Blob Service Client asynchronously
+# Signed URLs are reused well inside their own expiry, so a served URL always has
+# at least expiry_minutes - 5 minutes left
+SAS_CACHE_TTL_SECONDS = 300
+_sas_url_cache = TTLCache(maxsize=10_000, ttl=SAS_CACHE_TTL_SECONDS)
+
+# Shared clients, created once per process so connections are pooled across requests
+_blob_service_client: Optional[BlobServiceClient] = None
+_container_client: Optional[ContainerClient] = None
+
 async def get_blob_service_client() -> BlobServiceClient:
-    return BlobServiceClient.from_connection_string(AZURE_STORAGE_CONNECTION_STRING)
+    global _blob_service_client
+    if _blob_service_client is None:
+        # One keep-alive session for every blob call; owned (and closed) by the transport
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=200, keepalive_timeout=75)
+        )
+        transport = AioHttpTransport(
+            session=session,
+            session_owner=True,
+            connection_timeout=20,
+            read_timeout=60
+        )
+        _blob_service_client = BlobServiceClient.from_connection_string(
+            AZURE_STORAGE_CONNECTION_STRING,
+            transport=transport,
+            max_single_get_size=64 * 1024 * 1024,
+            max_chunk_get_size=BLOB_CHUNK_SIZE,
+            max_block_size=BLOB_CHUNK_SIZE
+        )
+    return _blob_service_client
 
 # Helper to get container client
 async def get_container_client() -> ContainerClient:
-    blob_service_client = await get_blob_service_client()
-    container_client = blob_service_client.get_container_client(AZURE_BLOB_CONTAINER_NAME)
+    global _container_client
+    if _container_client is None:
+        blob_service_client = await get_blob_service_client()
+        _container_client = blob_service_client.get_container_client(AZURE_BLOB_CONTAINER_NAME)
+    return _container_client
+
+async def startup_blob_storage():
+    """Create the shared clients and make sure the container exists"""
+    container_client = await get_container_client()
     try:
         await container_client.create_container()
-    except Exception as e:
-        # Container already exists, or other error
-        print(f"Container creation failed (might already exist): {e}")
-    return container_client
+    except ResourceExistsError:
+        pass
+
+async def shutdown_blob_storage():
+    """Close the shared blob service client"""
+    global _blob_service_client, _container_client
+    if _blob_service_client is not None:
+        await _blob_service_client.close()
+        _blob_service_client = None
+        _container_client = None
+
+async def get_blob_client(blob_name: str) -> BlobClient:
+    """Get a client for a stored blob reference.
+
+    New rows store the blob name (e.g. "video/<id>.mp4") inside the shared
+    container; legacy rows store the full blob URL, parsed here as
+    "/<container>/<blob name>" so multi-segment blob names stay intact."""
+    if "://" not in blob_name:
+        container_client = await get_container_client()
+        return container_client.get_blob_client(blob_name)
+
+    container_name, legacy_blob_name = unquote(urlparse(blob_name).path).lstrip("/").split("/", 1)
+    if container_name == AZURE_BLOB_CONTAINER_NAME:
+        container_client = await get_container_client()
+    else:
+        blob_service_client = await get_blob_service_client()
+        container_client = blob_service_client.get_container_client(container_name)
+    return container_client.get_blob_client(legacy_blob_name)
+
+async def get_blob_url(blob_name: str) -> str:
+    """Get the plain (unsigned) URL of a blob."""
+    blob_client = await get_blob_client(blob_name)
+    return blob_client.url
+
+# Read size for uploads; bounds what is held in memory per upload
+UPLOAD_READ_SIZE = 8 * 1024 * 1024
+
+async def _iter_upload_file(file: UploadFile, max_bytes: Optional[int] = None) -> AsyncIterator[bytes]:
+    """Yield an upload in fixed-size chunks; UploadFile.read runs off the event loop.
+    Stops with 413 as soon as more than max_bytes have been read."""
+    total = 0
+    while chunk := await file.read(UPLOAD_READ_SIZE):
+        total += len(chunk)
+        if max_bytes is not None and total > max_bytes:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+        yield chunk
 
-async def upload_file_to_blob(file: UploadFile, file_type: str = "video") -> str:
-    """Uploads a file to Azure Blob Storage and returns its URL."""
+async def upload_file_to_blob(file: UploadFile, file_type: str = "video", max_bytes: Optional[int] = None) -> str:
+    """Uploads a file to Azure Blob Storage and returns its blob name."""
     container_client = await get_container_client()
     
     # Generate a unique blob name
     file_extension = os.path.splitext(file.filename)[1]
-    blob_name = f"{file_type}/{uuid.uuid4()}{file_extension}"
+    blob_name = f"{file_type}/{secrets.token_urlsafe(16)}{file_extension}"
     
     blob_client: BlobClient = container_client.get_blob_client(blob_name)
     
-    # Read file content asynchronously
-    file_content = await file.read()
-    
-    # Upload the file
-    await blob_client.upload_blob(file_content, overwrite=True)
+    # Stream the upload to Azure chunk by chunk; the SDK stages blocks in parallel
+    await blob_client.upload_blob(
+        _iter_upload_file(file, max_bytes),
+        overwrite=True,
+        max_concurrency=8,
+        length=getattr(file, "size", None),
+        # Azure serves the blob with this type on SAS downloads; players need the real video MIME type
+        content_settings=ContentSettings(content_type=file.content_type)
+    )
     
-    return blob_client.url
+    return blob_name
 
-async def download_blob_chunk(blob_url: str, start_byte: int, end_byte: int) -> bytes:
-    """Downloads a chunk of a blob from a given URL."""
-    blob_service_client = await get_blob_service_client()
-    
-    # Extract container name and blob name from the URL
-    # This is a simplified extraction; a robust solution might parse the URL more carefully.
-    parts = blob_url.split('/')
-    container_name = parts[-2]
-    blob_name = parts[-1]
-
-    container_client = blob_service_client.get_container_client(container_name)
-    blob_client = container_client.get_blob_client(blob_name)
-
-    # Download a specific range of bytes
-    download_stream = await blob_client.download_blob(offset=start_byte, length=end_byte - start_byte + 1)
-    chunk = await download_stream.readall()
-    return chunk
-
-async def get_blob_size(blob_url: str) -> int:
-    """Gets the size of a blob from a given URL."""
-    blob_service_client = await get_blob_service_client()
-    parts = blob_url.split('/')
-    container_name = parts[-2]
-    blob_name = parts[-1]
-    
-    container_client = blob_service_client.get_container_client(container_name)
-    blob_client = container_client.get_blob_client(blob_name)
-    
-    props = await blob_client.get_blob_properties()
-    return props.size
+# Service SAS version signed by generate_sas_urls (the SDK's own default); the
+# string-to-sign below follows its layout
+SAS_VERSION = "2023-11-03"
+_sas_mac: Optional[hmac.HMAC] = None
 
-async def generate_sas_url(blob_url: str, expiry_minutes: int = 60) -> str:
-    """Generate a read-only SAS URL for a blob."""
-    blob_client = BlobClient.from_blob_url(blob_url)
-
-    sas_token = generate_blob_sas(
-        account_name=AZURE_STORAGE_ACCOUNT_NAME,
-        container_name=AZURE_BLOB_CONTAINER_NAME,
-        blob_name=blob_client.blob_name,
-        account_key=AZURE_STORAGE_ACCOUNT_KEY,
-        permission=BlobSasPermissions(read=True),
-        expiry=datetime.utcnow() + timedelta(minutes=expiry_minutes),
-    )
+def _get_sas_mac() -> hmac.HMAC:
+    """HMAC keyed with the account key; copied per signature so the key schedule runs once"""
+    global _sas_mac
+    if _sas_mac is None:
+        _sas_mac = hmac.new(base64.b64decode(AZURE_STORAGE_ACCOUNT_KEY), digestmod=hashlib.sha256)
+    return _sas_mac
+
+def guess_video_content_type(blob_name: str) -> str:
+    """MIME type for a video blob from its extension, defaulting to MP4"""
+    content_type, _ = mimetypes.guess_type(blob_name)
+    return content_type if content_type and content_type.startswith("video/") else "video/mp4"
 
-    return f"{blob_url}?{sas_token}"
\ No newline at end of file
+async def generate_sas_urls(blob_names: List[str], expiry_minutes: int = 60,
+                            content_type: Optional[str] = None) -> List[str]:
+    """Generate read-only SAS URLs for a batch of blobs, in the same order.
+    content_type, if given, is signed in as a Content-Type override (rsct) for the download."""
+    expiry = (datetime.now(timezone.utc) + timedelta(minutes=expiry_minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    mac = _get_sas_mac()
+    sas_urls = []
+    for blob_name in blob_names:
+        cache_key = (blob_name, expiry_minutes, content_type)
+        sas_url = _sas_url_cache.get(cache_key)
+        if sas_url is None:
+            blob_client = await get_blob_client(blob_name)
+            canonical_resource = f"/blob/{AZURE_STORAGE_ACCOUNT_NAME}/{blob_client.container_name}/{blob_client.blob_name}"
+            # sp, st, se, resource, si, sip, spr, sv, sr, snapshot, ses, rscc, rscd, rsce, rscl, rsct
+            string_to_sign = "\n".join((
+                "r", "", expiry, canonical_resource, "", "", "", SAS_VERSION, "b",
+                "", "", "", "", "", "", content_type or ""
+            ))
+            signer = mac.copy()
+            signer.update(string_to_sign.encode())
+            signature = base64.b64encode(signer.digest()).decode()
+            sas_token = f"se={quote(expiry)}&sp=r&sv={SAS_VERSION}&sr=b"
+            if content_type:
+                sas_token += f"&rsct={quote(content_type)}"
+            sas_token += f"&sig={quote(signature)}"
+            sas_url = f"{blob_client.url}?{sas_token}"
+            _sas_url_cache[cache_key] = sas_url
+        sas_urls.append(sas_url)
+    return sas_urls
+
+async def generate_sas_url(blob_name: str, expiry_minutes: int = 60, content_type: Optional[str] = None) -> str:
+    """Generate a read-only SAS URL for a blob."""
+    sas_urls = await generate_sas_urls([blob_name], expiry_minutes, content_type)
+    return sas_urls[0]
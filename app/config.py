@@ -1,23 +1,53 @@
 import os
+from typing import Final, Optional
+
+# Values are read once at import; import these names rather than re-reading os.environ
 
 # Security / JWT
-SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Pre-encoded so jwt.encode/jwt.decode don't re-encode the key on every call
+SECRET_KEY: Final[bytes] = os.getenv("SECRET_KEY", "supersecretkey").encode()
+ALGORITHM: Final[str] = "HS256"
+ACCESS_TOKEN_EXPIRE_MINUTES: Final[int] = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# In-process caches of user rows and verified tokens for the auth path; set to 0 to disable (e.g. in tests)
+USER_CACHE_ENABLED: Final[bool] = os.getenv("USER_CACHE_ENABLED", "1") == "1"
+
+# CORS: comma-separated list of frontend origins allowed to call the API
+CORS_ALLOW_ORIGINS: Final[list] = [
+    origin.strip()
+    for origin in os.getenv("CORS_ALLOW_ORIGINS", "http://localhost:3000,http://localhost:5173").split(",")
+    if origin.strip()
+]
 
 # Database
-DATABASE_URL = os.getenv("DATABASE_URL")
-PG_HOST = os.getenv("PGHOST")
-PG_USER = os.getenv("PGUSER")
-PG_PORT = os.getenv("PGPORT")
-PG_DATABASE = os.getenv("PGDATABASE")
-PG_PASSWORD = os.getenv("PGPASSWORD")
+DATABASE_URL: Final[Optional[str]] = os.getenv("DATABASE_URL")
+PG_HOST: Final[Optional[str]] = os.getenv("PGHOST")
+PG_USER: Final[Optional[str]] = os.getenv("PGUSER")
+PG_PORT: Final[Optional[str]] = os.getenv("PGPORT")
+PG_DATABASE: Final[Optional[str]] = os.getenv("PGDATABASE")
+PG_PASSWORD: Final[Optional[str]] = os.getenv("PGPASSWORD")
+DB_POOL_MAX_SIZE: Final[int] = int(os.getenv("DB_POOL_MAX_SIZE", 50))
+# Connections kept open (and warmed at startup); never more than the pool's max size
+DB_POOL_MIN_SIZE: Final[int] = min(int(os.getenv("DB_POOL_MIN_SIZE", 10)), DB_POOL_MAX_SIZE)
+# Seconds a request waits for a free pooled connection before failing with 503
+DB_POOL_TIMEOUT: Final[float] = float(os.getenv("DB_POOL_TIMEOUT", 2.0))
+# Server-side prepared statements; set to 0 when connecting through PgBouncer in transaction mode
+DB_PREPARED_STATEMENTS: Final[bool] = os.getenv("DB_PREPARED_STATEMENTS", "1") == "1"
+# Planner mode for prepared statements; custom plans keep per-value row estimates (e.g. keyset bounds)
+DB_PLAN_CACHE_MODE: Final[str] = os.getenv("DB_PLAN_CACHE_MODE", "force_custom_plan")
 
 # Azure Storage
-AZURE_STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
-AZURE_BLOB_CONTAINER_NAME = os.getenv("AZURE_BLOB_CONTAINER_NAME")
-AZURE_STORAGE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
-AZURE_STORAGE_ACCOUNT_KEY = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
+AZURE_STORAGE_CONNECTION_STRING: Final[Optional[str]] = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+AZURE_BLOB_CONTAINER_NAME: Final[Optional[str]] = os.getenv("AZURE_BLOB_CONTAINER_NAME")
+AZURE_STORAGE_ACCOUNT_NAME: Final[Optional[str]] = os.getenv("AZURE_STORAGE_ACCOUNT_NAME")
+AZURE_STORAGE_ACCOUNT_KEY: Final[Optional[str]] = os.getenv("AZURE_STORAGE_ACCOUNT_KEY")
+# Size of each block/range the SDK moves per request; ~4 MiB is where Azure throughput levels off
+BLOB_CHUNK_SIZE: Final[int] = int(os.getenv("BLOB_CHUNK_SIZE", 4 * 1024 * 1024))
+
+# Uploads
+MAX_VIDEO_UPLOAD_BYTES: Final[int] = int(os.getenv("MAX_VIDEO_UPLOAD_BYTES", 2 * 1024 * 1024 * 1024))
+MAX_THUMBNAIL_UPLOAD_BYTES: Final[int] = int(os.getenv("MAX_THUMBNAIL_UPLOAD_BYTES", 10 * 1024 * 1024))
+ALLOWED_VIDEO_TYPES: Final[frozenset] = frozenset({"video/mp4", "video/webm"})
+ALLOWED_THUMBNAIL_TYPES: Final[frozenset] = frozenset({"image/jpeg", "image/png", "image/webp"})
 
 # Example: optional fallback for timedelta
-ACCESS_TOKEN_EXPIRE = 30
+ACCESS_TOKEN_EXPIRE: Final[int] = 30
@@ -1,81 +1,170 @@
 # crud.py
+import logging
 import psycopg
 from psycopg import AsyncConnection  # For type hints
-from psycopg.rows import dict_row
-from typing import Optional, List, Dict, Any
-from app.auth_utils import get_password_hash
+from psycopg.rows import class_row, dict_row
+from dataclasses import dataclass
+from datetime import datetime
+from cachetools import TTLCache
+from typing import Optional, List, Dict, Any, Set
+from app.auth_utils import get_password_hash, invalidate_cached_user
+from app.config import USER_CACHE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# --- Row types ---
+@dataclass(slots=True)
+class VideoRow:
+    """Fixed-slot row for the video feed; cheaper to build than a dict per row"""
+    id: int
+    title: str
+    description: Optional[str]
+    blob_url: str
+    thumbnail_url: Optional[str]
+    upload_timestamp: datetime
+    owner_id: int
 
 # --- User CRUD ---
+# User rows only change on role updates, which evict explicitly
+# Usernames are immutable (there is no rename path), so they can be cached for longer
+USERNAME_CACHE = TTLCache(maxsize=50_000, ttl=600)
+_user_by_id_cache = TTLCache(maxsize=10_000, ttl=30)
+_user_by_username_cache = TTLCache(maxsize=10_000, ttl=30)
+
 async def get_user(conn: AsyncConnection, user_id: int) -> Optional[Dict[str, Any]]:
+    if USER_CACHE_ENABLED and user_id in _user_by_id_cache:
+        return dict(_user_by_id_cache[user_id])
     async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute("SELECT * FROM users WHERE id = %s", (user_id,))
-        return await cursor.fetchone()
+        await cursor.execute("SELECT id, username, email, role FROM users WHERE id = %s", (user_id,))
+        row = await cursor.fetchone()
+    if row and USER_CACHE_ENABLED:
+        _user_by_id_cache[user_id] = dict(row)
+    return row
 
 async def get_user_by_username(conn: AsyncConnection, username: str) -> Optional[Dict[str, Any]]:
+    if USER_CACHE_ENABLED and username in _user_by_username_cache:
+        return dict(_user_by_username_cache[username])
+    async with conn.cursor(row_factory=dict_row) as cursor:
+        await cursor.execute(
+            "SELECT id, username, email, role FROM users WHERE username = %s",
+            (username,),
+            prepare=True
+        )
+        row = await cursor.fetchone()
+    if row and USER_CACHE_ENABLED:
+        _user_by_username_cache[username] = dict(row)
+    return row
+
+async def get_user_with_password(conn: AsyncConnection, username: str) -> Optional[Dict[str, Any]]:
+    """Like get_user_by_username but includes hashed_password; only the login path needs it."""
     async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute("SELECT * FROM users WHERE username = %s", (username,))
+        await cursor.execute(
+            "SELECT id, username, email, hashed_password, role FROM users WHERE username = %s",
+            (username,)
+        )
         return await cursor.fetchone()
 
+async def get_usernames(conn: AsyncConnection, user_ids: Set[int]) -> Dict[int, str]:
+    """Resolve user ids to usernames, querying only the ids not already cached."""
+    missing = [user_id for user_id in user_ids if user_id not in USERNAME_CACHE]
+    if missing:
+        async with conn.cursor() as cursor:
+            await cursor.execute("SELECT id, username FROM users WHERE id = ANY(%s)", (missing,), prepare=True)
+            async for user_id, username in cursor:
+                USERNAME_CACHE[user_id] = username
+    return {user_id: USERNAME_CACHE[user_id] for user_id in user_ids if user_id in USERNAME_CACHE}
+
 async def get_user_by_email(conn: AsyncConnection, email: str) -> Optional[Dict[str, Any]]:
     async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute("SELECT * FROM users WHERE email = %s", (email,))
+        await cursor.execute("SELECT id, username, email, role FROM users WHERE email = %s", (email,))
         return await cursor.fetchone()
 
 async def create_user(conn: AsyncConnection, username: str, email: str, password: str, role: str = "consumer") -> Dict[str, Any]:
-    hashed_password = get_password_hash(password)
+    """Insert a user in one round-trip; the unique indexes double as the duplicate checks.
+    Raises ValueError naming the taken field."""
+    hashed_password = await get_password_hash(password)
     query = """
         INSERT INTO users (username, email, hashed_password, role)
         VALUES (%s, %s, %s, %s)
-        RETURNING *
+        ON CONFLICT (username) DO NOTHING
+        RETURNING id, username, email, role
     """
     try:
         async with conn.cursor(row_factory=dict_row) as cursor:
             await cursor.execute(query, (username, email, hashed_password, role))
             row = await cursor.fetchone()
-            await conn.commit()
-        print(f"Created user: {username}")
-        return row
     except psycopg.errors.UniqueViolation as e:
-        await conn.rollback()
-        if 'username' in str(e):
-            raise ValueError("Username already exists")
-        elif 'email' in str(e):
-            raise ValueError("Email already exists")
-        else:
-            raise ValueError("User creation failed: duplicate entry")
+        if e.diag.constraint_name == "users_email_key":
+            raise ValueError("Email already registered")
+        raise ValueError("User creation failed: duplicate entry")
     except Exception as e:
-        await conn.rollback()
         raise ValueError(f"User creation failed: {e}")
+    if row is None:
+        raise ValueError("Username already registered")
+    logger.debug("Created user: %s", username)
+    return row
 
 async def update_user_role(conn: AsyncConnection, user_id: int, new_role: str) -> Optional[Dict[str, Any]]:
-    query = "UPDATE users SET role = %s WHERE id = %s RETURNING *"
+    query = "UPDATE users SET role = %s WHERE id = %s RETURNING id, username, email, role"
     async with conn.cursor(row_factory=dict_row) as cursor:
         await cursor.execute(query, (new_role, user_id))
         row = await cursor.fetchone()
-        await conn.commit()
     if row:
-        print(f"Updated role for user {user_id} to {new_role}")
+        logger.debug("Updated role for user %s to %s", user_id, new_role)
+    # Callers evict with invalidate_user once their transaction has committed
     return row
 
+def invalidate_user(user_id: int, username: Optional[str] = None):
+    """Drop cached copies of a user. Call after the change is committed, otherwise a
+    concurrent cache miss can read and re-cache the old row before the commit lands"""
+    _user_by_id_cache.pop(user_id, None)
+    if username is not None:
+        _user_by_username_cache.pop(username, None)
+    invalidate_cached_user(user_id)
+
 # --- Video CRUD ---
 async def create_video(conn: AsyncConnection, title: str, description: Optional[str], 
                       blob_url: str, owner_id: int, thumbnail_url: Optional[str] = None) -> Dict[str, Any]:
     query = """
         INSERT INTO videos (title, description, blob_url, thumbnail_url, owner_id)
         VALUES (%s, %s, %s, %s, %s)
-        RETURNING *
+        RETURNING id, title, description, blob_url, thumbnail_url, upload_timestamp, owner_id
     """
     async with conn.cursor(row_factory=dict_row) as cursor:
         await cursor.execute(query, (title, description, blob_url, thumbnail_url, owner_id))
         row = await cursor.fetchone()
-        await conn.commit()
-    print(f"Created video: {title} for user {owner_id}")
+    logger.debug("Created video: %s for user %s", title, owner_id)
     return row
 
-# async def get_video(conn: AsyncConnection, video_id: int) -> Optional[Dict[str, Any]]:
-#     async with conn.cursor(row_factory=dict_row) as cursor:
-#         await cursor.execute("SELECT * FROM videos WHERE id = %s", (video_id,))
-#         return await cursor.fetchone()
+async def create_videos_bulk(conn: AsyncConnection, videos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert many videos in one pipelined batch (one Sync for the whole batch)."""
+    if not videos:
+        return []
+    query = """
+        INSERT INTO videos (title, description, blob_url, thumbnail_url, owner_id)
+        VALUES (%(title)s, %(description)s, %(blob_url)s, %(thumbnail_url)s, %(owner_id)s)
+        RETURNING id, title, description, blob_url, thumbnail_url, upload_timestamp, owner_id
+    """
+    params = [
+        {
+            "title": video["title"],
+            "description": video.get("description"),
+            "blob_url": video["blob_url"],
+            "thumbnail_url": video.get("thumbnail_url"),
+            "owner_id": video["owner_id"]
+        }
+        for video in videos
+    ]
+    rows = []
+    # All-or-nothing: the batch runs in its own transaction (a savepoint if the caller opened one)
+    async with conn.transaction(), conn.pipeline(), conn.cursor(row_factory=dict_row) as cursor:
+        await cursor.executemany(query, params, returning=True)
+        while True:
+            rows.append(await cursor.fetchone())
+            if not cursor.nextset():
+                break
+    logger.debug("Created %s videos", len(rows))
+    return rows
 
 async def get_video(conn: AsyncConnection, video_id: int) -> Optional[Dict[str, Any]]:
     query = """
@@ -87,29 +176,71 @@ async def get_video(conn: AsyncConnection, video_id: int) -> Optional[Dict[str,
             v.thumbnail_url,
             v.upload_timestamp,
             v.owner_id,
-            u.username AS owner_username,
-            v.upload_timestamp AS created_at
+            -- Optional mapping for frontend, shaped here so rows need no Python rewrite
+            v.upload_timestamp AS created_at,
+            json_build_object('username', u.username) AS owner
         FROM videos v
         JOIN users u ON v.owner_id = u.id
         WHERE v.id = %s
     """
     async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute(query, (video_id,))
-        row = await cursor.fetchone()
-        if row:
-            # Optional mapping for frontend
-            row["owner"] = {"username": row.pop("owner_username", "Unknown")}
-            row["created_at"] = row.pop("created_at", row["upload_timestamp"])
-        return row
+        await cursor.execute(query, (video_id,), prepare=True)
+        return await cursor.fetchone()
 
 
-# async def get_videos(conn: AsyncConnection, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
-#     query = "SELECT * FROM videos ORDER BY upload_timestamp DESC LIMIT %s OFFSET %s"
-#     async with conn.cursor(row_factory=dict_row) as cursor:
-#         await cursor.execute(query, (limit, skip))
-#         return await cursor.fetchall()
+async def get_videos(conn: AsyncConnection, after_ts: Optional[datetime] = None,
+                     after_id: Optional[int] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    # Keyset pagination: seek past the last (upload_timestamp, id) seen instead of OFFSET
+    after = "AND (upload_timestamp, id) < (%s, %s)" if after_ts is not None else ""
+    params = (after_ts, after_id, limit) if after_ts is not None else (limit,)
+    # No users JOIN: owner names come from the in-memory username cache below
+    query = f"""
+        SELECT id, title, description, blob_url, thumbnail_url, upload_timestamp, owner_id
+        FROM videos
+        WHERE owner_id IS NOT NULL {after}
+        ORDER BY upload_timestamp DESC, id DESC
+        LIMIT %s
+    """
+    async with conn.cursor(row_factory=class_row(VideoRow)) as cursor:
+        await cursor.execute(query, params, prepare=True)
+        rows = [row async for row in cursor]
+
+    usernames = await get_usernames(conn, {row.owner_id for row in rows})
+    # Each response dict is built once, with the optional frontend fields in place
+    return [
+        {
+            "id": row.id,
+            "title": row.title,
+            "description": row.description,
+            "blob_url": row.blob_url,
+            "thumbnail_url": row.thumbnail_url,
+            "upload_timestamp": row.upload_timestamp,
+            "owner_id": row.owner_id,
+            "created_at": row.upload_timestamp,
+            "owner": {"username": usernames.get(row.owner_id, "Unknown")}
+        }
+        for row in rows
+    ]
+
+
+async def get_creator_videos(conn: AsyncConnection, owner_id: int, after_ts: Optional[datetime] = None,
+                             after_id: Optional[int] = None, limit: int = 10) -> List[Dict[str, Any]]:
+    after = "AND (upload_timestamp, id) < (%s, %s)" if after_ts is not None else ""
+    params = (owner_id, after_ts, after_id, limit) if after_ts is not None else (owner_id, limit)
+    query = f"""
+        SELECT id, title, description, blob_url, thumbnail_url, upload_timestamp, owner_id
+        FROM videos
+        WHERE owner_id = %s {after}
+        ORDER BY upload_timestamp DESC, id DESC
+        LIMIT %s
+    """
+    async with conn.cursor(row_factory=dict_row) as cursor:
+        await cursor.execute(query, params)
+        return await cursor.fetchall()
 
-async def get_videos(conn: AsyncConnection, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+async def get_video_detail(conn: AsyncConnection, video_id: int, limit: int = 10) -> Optional[Dict[str, Any]]:
+    """Fetch a video, its latest comments and its rating stats in one round-trip.
+    Nesting is built by Postgres (json_build_object/json_agg), not per row in Python."""
     query = """
         SELECT
             v.id,
@@ -119,194 +250,240 @@ async def get_videos(conn: AsyncConnection, skip: int = 0, limit: int = 10) -> L
             v.thumbnail_url,
             v.upload_timestamp,
             v.owner_id,
-            u.username AS owner_username,
-            v.upload_timestamp AS created_at
+            v.upload_timestamp AS created_at,
+            json_build_object('username', u.username) AS owner,
+            json_build_object(
+                'avg_score', COALESCE(rs.avg_score, 0),
+                'total_ratings', rs.total_ratings,
+                'min_score', COALESCE(rs.min_score, 0),
+                'max_score', COALESCE(rs.max_score, 0)
+            ) AS rating_stats,
+            COALESCE(cm.comments, '[]') AS comments
         FROM videos v
-        JOIN users u ON v.owner_id = u.id
-        ORDER BY v.upload_timestamp DESC
-        LIMIT %s OFFSET %s
+        JOIN users u ON u.id = v.owner_id
+        LEFT JOIN LATERAL (
+            SELECT AVG(score) AS avg_score, COUNT(*) AS total_ratings, MIN(score) AS min_score, MAX(score) AS max_score
+            FROM ratings r
+            WHERE r.video_id = v.id
+        ) rs ON true
+        LEFT JOIN LATERAL (
+            SELECT json_agg(
+                json_build_object(
+                    'id', c.id,
+                    'content', c.text,
+                    'owner_id', c.owner_id,
+                    'video_id', c.video_id,
+                    'created_at', c.timestamp,
+                    'owner', json_build_object('username', cu.username)
+                )
+                ORDER BY c.timestamp DESC, c.id DESC
+            ) AS comments
+            FROM (
+                SELECT id, text, owner_id, video_id, timestamp
+                FROM comments
+                WHERE video_id = v.id
+                ORDER BY timestamp DESC, id DESC
+                LIMIT %s
+            ) c
+            JOIN users cu ON cu.id = c.owner_id
+        ) cm ON true
+        WHERE v.id = %s
     """
     async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute(query, (limit, skip))
-        rows = await cursor.fetchall()
-
-        # Map optional frontend fields
-        for row in rows:
-            row["owner"] = {"username": row.pop("owner_username", "Unknown")}
-            row["created_at"] = row.pop("created_at", row["upload_timestamp"])
-
-        return rows
-
-
-async def get_creator_videos(conn: AsyncConnection, owner_id: int, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
-    query = "SELECT * FROM videos WHERE owner_id = %s ORDER BY upload_timestamp DESC LIMIT %s OFFSET %s"
-    async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute(query, (owner_id, limit, skip))
-        return await cursor.fetchall()
+        await cursor.execute(query, (limit, video_id), prepare=True)
+        row = await cursor.fetchone()
+    if row is None:
+        return None
+    return {
+        "comments": row.pop("comments"),
+        "rating_stats": row.pop("rating_stats"),
+        "video": row
+    }
 
 async def delete_video(conn: AsyncConnection, video_id: int, owner_id: int) -> bool:
     query = "DELETE FROM videos WHERE id = %s AND owner_id = %s"
     async with conn.cursor() as cursor:
         await cursor.execute(query, (video_id, owner_id))
         deleted_rows = cursor.rowcount
-        await conn.commit()
     if deleted_rows > 0:
-        print(f"Deleted video {video_id} by user {owner_id}")
+        logger.debug("Deleted video %s by user %s", video_id, owner_id)
         return True
     return False
 
 # --- Comment CRUD ---
-async def create_comment(conn: AsyncConnection, text: str, owner_id: int, video_id: int) -> Dict[str, Any]:
+async def create_comment(conn: AsyncConnection, text: str, owner_id: int, video_id: int) -> Optional[Dict[str, Any]]:
+    """Insert a comment; returns None if the video doesn't exist (its foreign key is the check)"""
     query = """
-        INSERT INTO comments (text, owner_id, video_id)
-        VALUES (%s, %s, %s)
-        RETURNING id, text AS content, owner_id, video_id, timestamp AS created_at
+        WITH ins AS (
+            INSERT INTO comments (text, owner_id, video_id)
+            VALUES (%s, %s, %s)
+            RETURNING id, text AS content, owner_id, video_id, timestamp AS created_at
+        )
+        SELECT ins.*, json_build_object('username', COALESCE(u.username, 'Anonymous')) AS owner
+        FROM ins
+        LEFT JOIN users u ON u.id = ins.owner_id
     """
-    async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute(query, (text, owner_id, video_id))
-        row = await cursor.fetchone()
-
-    # Get username for owner
-    async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute("SELECT username FROM users WHERE id = %s", (owner_id,))
-        user_row = await cursor.fetchone()
-        row["owner"] = {"username": user_row["username"] if user_row else "Anonymous"}
+    try:
+        async with conn.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(query, (text, owner_id, video_id))
+            row = await cursor.fetchone()
+    except psycopg.errors.ForeignKeyViolation as e:
+        if e.diag.constraint_name == "comments_video_id_fkey":
+            return None
+        raise
 
-    await conn.commit()
     return row
 
-# async def create_comment(conn: AsyncConnection, text: str, owner_id: int, video_id: int) -> Dict[str, Any]:
-#     query = "INSERT INTO comments (text, owner_id, video_id) VALUES (%s, %s, %s) RETURNING *"
-#     async with conn.cursor(row_factory=dict_row) as cursor:
-#         await cursor.execute(query, (text, owner_id, video_id))
-#         row = await cursor.fetchone()
-#         await conn.commit()
-#     print(f"Created comment on video {video_id} by user {owner_id}")
-#     return row
-
-async def get_comments_for_video(conn: AsyncConnection, video_id: int, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
+async def create_comments_bulk(conn: AsyncConnection, comments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Insert many comments in one pipelined batch (one Sync for the whole batch)."""
+    if not comments:
+        return []
     query = """
-        SELECT 
-            c.id,
-            c.text AS content,          -- rename text -> content
-            c.owner_id,
-            c.video_id,
-            c.timestamp AS created_at,  -- rename timestamp -> created_at
-            u.username AS owner_username
-        FROM comments c
-        JOIN users u ON c.owner_id = u.id
-        WHERE c.video_id = %s
-        ORDER BY c.timestamp DESC
-        LIMIT %s OFFSET %s
+        INSERT INTO comments (text, owner_id, video_id)
+        VALUES (%(text)s, %(owner_id)s, %(video_id)s)
+        RETURNING id, text AS content, owner_id, video_id, timestamp AS created_at
     """
-    async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute(query, (video_id, limit, skip))
-        rows = await cursor.fetchall()
-        for row in rows:
-            row["owner"] = {"username": row.pop("owner_username", "Anonymous")}
-        return rows
-
-
-# async def get_comments_for_video(conn: AsyncConnection, video_id: int, skip: int = 0, limit: int = 10) -> List[Dict[str, Any]]:
-#     query = """
-#         SELECT c.*, u.username
-#         FROM comments c
-#         JOIN users u ON c.owner_id = u.id
-#         WHERE c.video_id = %s
-#         ORDER BY c.timestamp DESC
-#         LIMIT %s OFFSET %s
-#     """
-#     async with conn.cursor(row_factory=dict_row) as cursor:
-#         await cursor.execute(query, (video_id, limit, skip))
-#         return await cursor.fetchall()
+    params = [
+        {"text": comment["text"], "owner_id": comment["owner_id"], "video_id": comment["video_id"]}
+        for comment in comments
+    ]
+    rows = []
+    # All-or-nothing: the batch runs in its own transaction (a savepoint if the caller opened one)
+    async with conn.transaction(), conn.pipeline(), conn.cursor(row_factory=dict_row) as cursor:
+        await cursor.executemany(query, params, returning=True)
+        while True:
+            rows.append(await cursor.fetchone())
+            if not cursor.nextset():
+                break
+    logger.debug("Created %s comments", len(rows))
+    return rows
+
+async def get_comments_for_video(conn: AsyncConnection, video_id: int, after_ts: Optional[datetime] = None,
+                                 after_id: Optional[int] = None, limit: int = 10) -> Optional[List[Dict[str, Any]]]:
+    """Fetch a page of a video's comments; returns None if the video doesn't exist"""
+    after = "AND (c.timestamp, c.id) < (%s, %s)" if after_ts is not None else ""
+    params = (after_ts, after_id, limit, video_id) if after_ts is not None else (limit, video_id)
+    # Postgres shapes and aggregates the page into one JSON array, so no per-row dicts are built here.
+    # Selecting from videos folds the existence check in: no video, no row
+    query = f"""
+        SELECT COALESCE((
+            SELECT json_agg(t ORDER BY t.created_at DESC, t.id DESC)
+            FROM (
+                SELECT 
+                    c.id,
+                    c.text AS content,          -- rename text -> content
+                    c.owner_id,
+                    c.video_id,
+                    c.timestamp AS created_at,  -- rename timestamp -> created_at
+                    json_build_object('username', u.username) AS owner
+                FROM comments c
+                JOIN users u ON c.owner_id = u.id
+                WHERE c.video_id = v.id {after}
+                ORDER BY c.timestamp DESC, c.id DESC
+                LIMIT %s
+            ) t
+        ), '[]') AS comments
+        FROM videos v
+        WHERE v.id = %s
+    """
+    async with conn.cursor() as cursor:
+        await cursor.execute(query, params, prepare=True)
+        row = await cursor.fetchone()
+    return row[0] if row is not None else None
+
 
 async def delete_comment(conn: AsyncConnection, comment_id: int, owner_id: int) -> bool:
     query = "DELETE FROM comments WHERE id = %s AND owner_id = %s"
     async with conn.cursor() as cursor:
         await cursor.execute(query, (comment_id, owner_id))
         deleted_rows = cursor.rowcount
-        await conn.commit()
     if deleted_rows > 0:
-        print(f"Deleted comment {comment_id} by user {owner_id}")
+        logger.debug("Deleted comment %s by user %s", comment_id, owner_id)
         return True
     return False
 
 # --- Rating CRUD ---
-# async def create_or_update_rating(conn: AsyncConnection, score: float, owner_id: int, video_id: int) -> Dict[str, Any]:
-#     query = """
-#         INSERT INTO ratings (score, owner_id, video_id)
-#         VALUES (%s, %s, %s)
-#         ON CONFLICT (owner_id, video_id)
-#         DO UPDATE SET score = EXCLUDED.score, timestamp = CURRENT_TIMESTAMP
-#         RETURNING *
-#     """
-#     async with conn.cursor(row_factory=dict_row) as cursor:
-#         await cursor.execute(query, (score, owner_id, video_id))
-#         row = await cursor.fetchone()
-#         await conn.commit()
-#     print(f"Created/updated rating for video {video_id} by user {owner_id}: {score}")
-#     return row
-
-async def create_or_update_rating(conn: AsyncConnection, score: float, owner_id: int, video_id: int) -> Dict[str, Any]:
+# Aggregates change slowly, so serve them from memory for a few seconds
+_rating_stats_cache = TTLCache(maxsize=10000, ttl=5)
+
+async def create_or_update_rating(conn: AsyncConnection, score: float, owner_id: int, video_id: int) -> Optional[Dict[str, Any]]:
+    """Upsert a user's rating; returns None if the video doesn't exist (its foreign key is the check)"""
     query = """
         INSERT INTO ratings (score, owner_id, video_id)
         VALUES (%s, %s, %s)
         ON CONFLICT (owner_id, video_id)
         DO UPDATE SET score = EXCLUDED.score, timestamp = CURRENT_TIMESTAMP
-        RETURNING id, score, video_id, owner_id, timestamp
+        RETURNING id, score, video_id, owner_id, timestamp AS created_at
     """
-    async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute(query, (score, owner_id, video_id))
-        row = await cursor.fetchone()
+    try:
+        async with conn.cursor(row_factory=dict_row) as cursor:
+            await cursor.execute(query, (score, owner_id, video_id))
+            row = await cursor.fetchone()
+    except psycopg.errors.ForeignKeyViolation as e:
+        if e.diag.constraint_name == "ratings_video_id_fkey":
+            return None
+        raise
 
-    # Rename timestamp -> created_at
-    row["created_at"] = row.pop("timestamp")
-    await conn.commit()
+    _rating_stats_cache.pop(video_id, None)
     return row
 
+async def upsert_rating(conn: AsyncConnection, score: float, owner_id: int, video_id: int) -> None:
+    """Fire-and-forget variant of create_or_update_rating: no RETURNING, no row decode."""
+    query = """
+        INSERT INTO ratings (score, owner_id, video_id)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (owner_id, video_id)
+        DO UPDATE SET score = EXCLUDED.score, timestamp = CURRENT_TIMESTAMP
+    """
+    async with conn.cursor() as cursor:
+        await cursor.execute(query, (score, owner_id, video_id))
+    _rating_stats_cache.pop(video_id, None)
 
-async def get_average_rating_for_video(conn: AsyncConnection, video_id: int) -> float:
-    async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute("SELECT AVG(score) as avg_score FROM ratings WHERE video_id = %s", (video_id,))
-        row = await cursor.fetchone()
-    return float(row['avg_score']) if row and row['avg_score'] else 0.0
 
-async def get_rating_stats_for_video(conn: AsyncConnection, video_id: int) -> Dict[str, Any]:
+async def get_rating_stats_for_video(conn: AsyncConnection, video_id: int) -> Optional[Dict[str, Any]]:
+    """Aggregate a video's ratings; returns None if the video doesn't exist"""
+    cached = _rating_stats_cache.get(video_id)
+    if cached is not None:
+        return dict(cached)
+
+    # Grouping on the video row folds the existence check in: no video, no row
     query = """
-        SELECT AVG(score) as avg_score, COUNT(*) as total_ratings, MIN(score) as min_score, MAX(score) as max_score
-        FROM ratings
-        WHERE video_id = %s
+        SELECT AVG(r.score) as avg_score, COUNT(r.score) as total_ratings, MIN(r.score) as min_score, MAX(r.score) as max_score
+        FROM videos v
+        LEFT JOIN ratings r ON r.video_id = v.id
+        WHERE v.id = %s
+        GROUP BY v.id
     """
     async with conn.cursor(row_factory=dict_row) as cursor:
         await cursor.execute(query, (video_id,))
         row = await cursor.fetchone()
-    return {
-        'avg_score': float(row['avg_score']) if row and row['avg_score'] else 0.0,
-        'total_ratings': row['total_ratings'] if row and row['total_ratings'] else 0,
-        'min_score': float(row['min_score']) if row and row['min_score'] else 0.0,
-        'max_score': float(row['max_score']) if row and row['max_score'] else 0.0
+    if row is None:
+        return None
+    stats = {
+        'avg_score': float(row['avg_score']) if row['avg_score'] else 0.0,
+        'total_ratings': row['total_ratings'],
+        'min_score': float(row['min_score']) if row['min_score'] else 0.0,
+        'max_score': float(row['max_score']) if row['max_score'] else 0.0
     }
-
-# async def get_user_rating_for_video(conn: AsyncConnection, user_id: int, video_id: int) -> Optional[Dict[str, Any]]:
-#     async with conn.cursor(row_factory=dict_row) as cursor:
-#         await cursor.execute("SELECT * FROM ratings WHERE owner_id = %s AND video_id = %s", (user_id, video_id))
-#         return await cursor.fetchone()
+    _rating_stats_cache[video_id] = stats
+    return dict(stats)
 
 async def get_user_rating_for_video(conn: AsyncConnection, user_id: int, video_id: int) -> Optional[Dict[str, Any]]:
     async with conn.cursor(row_factory=dict_row) as cursor:
-        await cursor.execute("SELECT id, score, owner_id, video_id, timestamp FROM ratings WHERE owner_id = %s AND video_id = %s", (user_id, video_id))
-        row = await cursor.fetchone()
-        if row:
-            row["created_at"] = row.pop("timestamp")
-        return row
+        await cursor.execute(
+            "SELECT id, score, owner_id, video_id, timestamp AS created_at FROM ratings WHERE owner_id = %s AND video_id = %s",
+            (user_id, video_id),
+            prepare=True
+        )
+        return await cursor.fetchone()
 
 async def delete_rating(conn: AsyncConnection, owner_id: int, video_id: int) -> bool:
     query = "DELETE FROM ratings WHERE owner_id = %s AND video_id = %s"
     async with conn.cursor() as cursor:
         await cursor.execute(query, (owner_id, video_id))
         deleted_rows = cursor.rowcount
-        await conn.commit()
+    _rating_stats_cache.pop(video_id, None)
     if deleted_rows > 0:
-        print(f"Deleted rating for video {video_id} by user {owner_id}")
+        logger.debug("Deleted rating for video %s by user %s", video_id, owner_id)
         return True
     return False
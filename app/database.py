@@ -1,9 +1,32 @@
 # database.py
+import logging
+import orjson
 import psycopg
+from psycopg.types.json import set_json_dumps, set_json_loads
 from psycopg_pool import AsyncConnectionPool
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
-from app.config import DATABASE_URL
+from app.config import (
+    DATABASE_URL,
+    DB_PLAN_CACHE_MODE,
+    DB_POOL_MAX_SIZE,
+    DB_POOL_MIN_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_PREPARED_STATEMENTS
+)
+
+logger = logging.getLogger(__name__)
+
+# Encode/decode json/jsonb values (e.g. json_agg results) with orjson instead of the stdlib
+set_json_dumps(orjson.dumps)
+set_json_loads(orjson.loads)
+
+async def _configure_connection(conn: psycopg.AsyncConnection):
+    """Run once on each new pooled connection"""
+    if not DB_PREPARED_STATEMENTS:
+        return
+    # Session-level, so only applied on direct connections (never through a transaction pooler)
+    await conn.execute("SELECT set_config('plan_cache_mode', %s, false)", (DB_PLAN_CACHE_MODE,))
 
 class DatabaseManager:
     def __init__(self):
@@ -18,23 +41,35 @@ class DatabaseManager:
             # Initialize pool without opening it automatically
             self.pool = AsyncConnectionPool(
                 conninfo=DATABASE_URL,
-                min_size=1,
-                max_size=10,
+                min_size=DB_POOL_MIN_SIZE,  # keep steady-state connections open so requests don't pay the TLS connect
+                max_size=DB_POOL_MAX_SIZE,
+                timeout=DB_POOL_TIMEOUT,  # cap waits for a free connection instead of stalling under load
+                max_idle=300,
+                max_lifetime=3600,  # recycle connections so their prepared statements don't pile up
+                kwargs={
+                    # Prepare statements from their first use; None turns preparing off entirely
+                    "prepare_threshold": 0 if DB_PREPARED_STATEMENTS else None,
+                    # Single statements commit on their own; multi-statement writes use conn.transaction()
+                    "autocommit": True
+                },
+                configure=_configure_connection,
                 open=False  # prevent automatic opening to avoid warnings
             )
             # Open the pool explicitly
             await self.pool.open()
-            print("Database connection pool created successfully using psycopg_pool")
+            # Warm the pool: wait until min_size connections are established before serving
+            await self.pool.wait(timeout=30)
+            logger.info("Database connection pool created successfully using psycopg_pool")
             return self.pool
         except Exception as e:
-            print(f"Failed to create database pool with psycopg_pool: {e}")
+            logger.error("Failed to create database pool with psycopg_pool: %s", e)
             raise
 
     async def close_pool(self):
         """Close the connection pool"""
         if self.pool:
             await self.pool.close()
-            print("Database connection pool closed")
+            logger.info("Database connection pool closed")
             self.pool = None
 
     @asynccontextmanager
@@ -54,66 +89,82 @@ async def get_db_connection():
     async with db_manager.get_connection() as cursor:
         yield cursor
 
+# Schema, executed as one batch on startup
+SCHEMA_STATEMENTS = [
+    # Users table
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(255) UNIQUE NOT NULL,
+        email VARCHAR(255) UNIQUE NOT NULL,
+        hashed_password VARCHAR(255) NOT NULL,
+        role VARCHAR(50) DEFAULT 'consumer' NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''',
+
+    # Videos table
+    '''
+    CREATE TABLE IF NOT EXISTS videos (
+        id SERIAL PRIMARY KEY,
+        title VARCHAR(255) NOT NULL,
+        description TEXT,
+        blob_url VARCHAR(500) NOT NULL,
+        thumbnail_url VARCHAR(500),
+        upload_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        owner_id INTEGER REFERENCES users(id) ON DELETE CASCADE
+    )
+    ''',
+
+    # Comments table
+    '''
+    CREATE TABLE IF NOT EXISTS comments (
+        id SERIAL PRIMARY KEY,
+        text TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        owner_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE
+    )
+    ''',
+
+    # Ratings table
+    '''
+    CREATE TABLE IF NOT EXISTS ratings (
+        id SERIAL PRIMARY KEY,
+        score REAL NOT NULL CHECK (score >= 0 AND score <= 5),
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        owner_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE,
+        UNIQUE(owner_id, video_id)
+    )
+    ''',
+
+    # Create indexes for better performance; each matches a WHERE + ORDER BY ... LIMIT query
+    # (sort key plus id tiebreaker for keyset pagination) so LIMIT stops early without a sort
+    'CREATE INDEX IF NOT EXISTS idx_videos_upload_timestamp_id ON videos(upload_timestamp DESC, id DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_videos_owner_ts ON videos(owner_id, upload_timestamp DESC, id DESC) INCLUDE (title, blob_url, thumbnail_url)',
+    'CREATE INDEX IF NOT EXISTS idx_comments_video_ts ON comments(video_id, timestamp DESC, id DESC) INCLUDE (text, owner_id)',
+    # Lets the rating aggregates run as an index-only scan
+    'CREATE INDEX IF NOT EXISTS idx_ratings_video_score ON ratings(video_id) INCLUDE (score)',
+
+    # Superseded by the composite indexes above; dropped to save write amplification
+    'DROP INDEX IF EXISTS idx_videos_owner_id',
+    'DROP INDEX IF EXISTS idx_videos_upload_timestamp',
+    'DROP INDEX IF EXISTS idx_comments_video_id',
+    'DROP INDEX IF EXISTS idx_comments_timestamp',
+    'DROP INDEX IF EXISTS idx_ratings_video_id',
+]
+
+SCHEMA_DDL = ";\n".join(SCHEMA_STATEMENTS)
+
 # Initialize database tables
 async def create_tables():
-    """Create all necessary tables"""
-    async with db_manager.get_connection() as cursor:
-        # Users table
-        await cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id SERIAL PRIMARY KEY,
-                username VARCHAR(255) UNIQUE NOT NULL,
-                email VARCHAR(255) UNIQUE NOT NULL,
-                hashed_password VARCHAR(255) NOT NULL,
-                role VARCHAR(50) DEFAULT 'consumer' NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-        ''')
-
-        # Videos table
-        await cursor.execute('''
-            CREATE TABLE IF NOT EXISTS videos (
-                id SERIAL PRIMARY KEY,
-                title VARCHAR(255) NOT NULL,
-                description TEXT,
-                blob_url VARCHAR(500) NOT NULL,
-                thumbnail_url VARCHAR(500),
-                upload_timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                owner_id INTEGER REFERENCES users(id) ON DELETE CASCADE
-            );
-        ''')
-
-        # Comments table
-        await cursor.execute('''
-            CREATE TABLE IF NOT EXISTS comments (
-                id SERIAL PRIMARY KEY,
-                text TEXT NOT NULL,
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                owner_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE
-            );
-        ''')
-
-        # Ratings table
-        await cursor.execute('''
-            CREATE TABLE IF NOT EXISTS ratings (
-                id SERIAL PRIMARY KEY,
-                score REAL NOT NULL CHECK (score >= 0 AND score <= 5),
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                owner_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-                video_id INTEGER REFERENCES videos(id) ON DELETE CASCADE,
-                UNIQUE(owner_id, video_id)
-            );
-        ''')
-
-        # Create indexes for better performance
-        await cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_owner_id ON videos(owner_id);')
-        await cursor.execute('CREATE INDEX IF NOT EXISTS idx_videos_upload_timestamp ON videos(upload_timestamp DESC);')
-        await cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_video_id ON comments(video_id);')
-        await cursor.execute('CREATE INDEX IF NOT EXISTS idx_comments_timestamp ON comments(timestamp DESC);')
-        await cursor.execute('CREATE INDEX IF NOT EXISTS idx_ratings_video_id ON ratings(video_id);')
-
-        print("Database tables created/verified successfully")
+    """Create all necessary tables in a single round-trip and transaction"""
+    async with db_manager.get_connection() as conn:
+        async with conn.transaction():
+            # Multi-statement strings can't be prepared, so opt out of the pool's prepare_threshold
+            await conn.execute(SCHEMA_DDL, prepare=False)
+
 
 # Startup and shutdown events
 async def startup_database():
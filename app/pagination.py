@@ -0,0 +1,33 @@
+# pagination.py
+import base64
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Response, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(timestamp: Union[datetime, str], row_id: int) -> str:
+    """Encode the (timestamp, id) keyset position of a row as an opaque cursor"""
+    # Rows aggregated to JSON by Postgres already carry ISO-8601 timestamp strings
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    raw = f"{timestamp}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[Optional[datetime], Optional[int]]:
+    """Decode a cursor from the client; no cursor means start from the newest row"""
+    if not cursor:
+        return None, None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        timestamp, row_id = raw.split("|")
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+def set_next_cursor(response: Response, rows: List[Dict[str, Any]], limit: int, timestamp_key: str):
+    """Expose the cursor for the next page when this page came back full"""
+    if rows and len(rows) == limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last[timestamp_key], last["id"])
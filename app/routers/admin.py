@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-import asyncpg
+from psycopg import AsyncConnection
 
 from app import crud, schemas, auth_utils
 from app.database import get_db_connection
@@ -10,7 +10,7 @@ router = APIRouter()
              dependencies=[Depends(auth_utils.require_admin)])
 async def enroll_creator(
     user_id: int,
-    conn: asyncpg.Connection = Depends(get_db_connection),
+    conn: AsyncConnection = Depends(get_db_connection),
     current_user: dict = Depends(auth_utils.get_current_active_user)  # Now returns dict instead of model
 ):
     """Enroll a user as a creator (assign 'creator' role). Requires 'admin' role."""
@@ -21,5 +21,10 @@ async def enroll_creator(
     if db_user["role"] == "creator":
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="User is already a creator")
     
+    # Autocommit: the UPDATE is committed when this returns
     updated_user = await crud.update_user_role(conn, user_id=user_id, new_role="creator")
+    # Evict only after COMMIT so no concurrent request can re-cache the old role
+    crud.invalidate_user(user_id, updated_user["username"] if updated_user else db_user["username"])
+    if updated_user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     return schemas.User(**updated_user)
\ No newline at end of file
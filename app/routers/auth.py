@@ -3,7 +3,7 @@ from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-import asyncpg
+from psycopg import AsyncConnection
 
 from app import crud, schemas, auth_utils
 from app.database import get_db_connection
@@ -14,43 +14,29 @@ router = APIRouter()
 @router.post("/signup", response_model=schemas.User)
 async def signup_user(
     user: schemas.UserCreate, 
-    conn: asyncpg.Connection = Depends(get_db_connection)
+    conn: AsyncConnection = Depends(get_db_connection)
 ):
-    # Check if username already exists
-    db_user_by_username = await crud.get_user_by_username(conn, username=user.username)
-    if db_user_by_username:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail="Username already registered"
-        )
-    
-    # Check if email already exists
-    db_user_by_email = await crud.get_user_by_email(conn, email=user.email)
-    if db_user_by_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, 
-            detail="Email already registered"
-        )
-    
+    """Register a consumer account; duplicate usernames/emails are rejected by the insert itself"""
     try:
+        # A single INSERT is atomic on its own; no explicit transaction needed
         db_user = await crud.create_user(
             conn, 
             username=user.username, 
             email=user.email, 
             password=user.password
         )
-        return schemas.User(**db_user)
     except ValueError as e:
         # Handle duplicate errors from crud layer
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return schemas.User(**db_user)
 
 @router.post("/login", response_model=schemas.Token)
 async def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    conn: asyncpg.Connection = Depends(get_db_connection)
+    conn: AsyncConnection = Depends(get_db_connection)
 ):
-    user = await crud.get_user_by_username(conn, username=form_data.username)
-    if not user or not auth_utils.verify_password(form_data.password, user["hashed_password"]):
+    user = await crud.get_user_with_password(conn, username=form_data.username)
+    if not user or not await auth_utils.verify_password(form_data.password, user["hashed_password"]):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -1,33 +1,39 @@
 # routers/consumers.py
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Request, Header
-import asyncpg
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi.responses import ORJSONResponse
+from psycopg import AsyncConnection
 from typing import List, Optional
-from starlette.responses import StreamingResponse
+from starlette.responses import RedirectResponse
 
-from app import crud, schemas, auth_utils, blob_storage
+from app import crud, schemas, auth_utils, blob_storage, pagination
 from app.database import get_db_connection
 
 router = APIRouter()
 
 @router.get("/", response_model=List[schemas.Video])
 async def list_latest_videos(
-    conn: asyncpg.Connection = Depends(get_db_connection),
-    skip: int = 0,
+    conn: AsyncConnection = Depends(get_db_connection),
+    cursor: Optional[str] = None,
     limit: int = 10,
     current_user: dict = Depends(auth_utils.get_current_active_user)  # Returns dict now
 ):
-    """List the latest videos. Accessible by any authenticated user."""
-    videos = await crud.get_videos(conn, skip=skip, limit=limit)
-    res_videos = []
-    for video in videos:
-        video["stream_url"] = await blob_storage.generate_sas_url(video["blob_url"])
-        res_videos.append(schemas.Video(**video))
-    return res_videos #[schemas.Video(**video) for video in videos]
+    """List the latest videos. Accessible by any authenticated user.
+    Pass the X-Next-Cursor header of a full page as `cursor` to fetch the next one."""
+    after_ts, after_id = pagination.decode_cursor(cursor)
+    videos = await crud.get_videos(conn, after_ts=after_ts, after_id=after_id, limit=limit)
+    # Sign the whole page in one batch, sharing the keyed HMAC state
+    sas_urls = await blob_storage.generate_sas_urls([video["blob_url"] for video in videos])
+    # Rows come from our own query in the schema's shape; skip re-validating them field by field
+    page = [schemas.Video.model_construct(**video, stream_url=sas_url) for video, sas_url in zip(videos, sas_urls)]
+    # Serialized by the precompiled adapter; returning a Response bypasses the response_model pass
+    response = Response(schemas.VIDEO_LIST_ADAPTER.dump_json(page), media_type="application/json")
+    pagination.set_next_cursor(response, videos, limit, "upload_timestamp")
+    return response
 
 @router.get("/{video_id}", response_model=schemas.Video)
 async def get_video_metadata(
     video_id: int,
-    conn: asyncpg.Connection = Depends(get_db_connection),
+    conn: AsyncConnection = Depends(get_db_connection),
     current_user: dict = Depends(auth_utils.get_current_active_user)  # Any authenticated user
 ):
     """Fetch metadata for a specific video. Accessible by any authenticated user."""
@@ -39,93 +45,83 @@ async def get_video_metadata(
 
     return schemas.Video(**db_video)
 
+@router.get("/{video_id}/detail", response_model=schemas.VideoDetail)
+async def get_video_detail(
+    video_id: int,
+    conn: AsyncConnection = Depends(get_db_connection),
+    limit: int = 10,
+    current_user: dict = Depends(auth_utils.get_current_active_user)  # Any authenticated user
+):
+    """Fetch a video with its latest comments and rating summary for the video page.
+    Accessible by any authenticated user."""
+    detail = await crud.get_video_detail(conn, video_id=video_id, limit=limit)
+    if detail is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
+
+    video = detail["video"]
+    video["stream_url"] = await blob_storage.generate_sas_url(video["blob_url"])
+
+    return schemas.VideoDetail(**detail)
+
 @router.get("/{video_id}/stream")
 async def stream_video(
     video_id: int,
-    request: Request,
-    conn: asyncpg.Connection = Depends(get_db_connection),
-    current_user: dict = Depends(auth_utils.get_current_active_user),  # Any authenticated user
-    range: Optional[str] = Header(None)  # For partial content streaming
+    conn: AsyncConnection = Depends(get_db_connection),
+    current_user: dict = Depends(auth_utils.get_current_active_user)  # Any authenticated user
 ):
     """Stream a video from Azure Blob Storage. Accessible by any authenticated user.
-    Supports range requests for seeking/resuming playback."""
+    Redirects to a short-lived read-only SAS URL, so the client fetches (and seeks with
+    Range requests) straight from Azure instead of through this API."""
     db_video = await crud.get_video(conn, video_id=video_id)
     if db_video is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
 
-    blob_url = db_video["blob_url"]  # Dictionary access instead of attribute
-    
-    file_size = await blob_storage.get_blob_size(blob_url)
-    
-    start_byte = 0
-    end_byte = file_size - 1
-
-    if range:
-        range_parts = range.replace("bytes=", "").split("-")
-        start_byte = int(range_parts[0])
-        if len(range_parts) > 1 and range_parts[1]:
-            end_byte = int(range_parts[1])
-        else:
-            end_byte = file_size - 1
-
-    if start_byte >= file_size or start_byte < 0:
-        raise HTTPException(status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
-
-    async def generate_chunks():
-        # Adjust chunk size as needed
-        chunk_size = 1024 * 1024  # 1 MB
-        current_offset = start_byte
-
-        while current_offset <= end_byte:
-            chunk_end = min(current_offset + chunk_size - 1, end_byte)
-            chunk = await blob_storage.download_blob_chunk(blob_url, current_offset, chunk_end)
-            yield chunk
-            current_offset += len(chunk)
-
-    headers = {
-        "Content-Type": "video/mp4",  # Assuming MP4, adjust if other formats are expected
-        "Accept-Ranges": "bytes",
-        "Content-Length": str(end_byte - start_byte + 1),
-        "Content-Range": f"bytes {start_byte}-{end_byte}/{file_size}",
-    }
-
-    return StreamingResponse(generate_chunks(), status_code=status.HTTP_206_PARTIAL_CONTENT, headers=headers)
+    blob_name = db_video["blob_url"]
+    # Force a video Content-Type on the download: older blobs were stored as application/octet-stream
+    sas_url = await blob_storage.generate_sas_url(
+        blob_name, content_type=blob_storage.guess_video_content_type(blob_name)
+    )
+    # 307 keeps the method and lets the client re-send its Range header to Azure
+    return RedirectResponse(sas_url, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
 
 @router.post("/{video_id}/comments", response_model=schemas.Comment, status_code=status.HTTP_201_CREATED)
 async def add_comment_to_video(
     video_id: int,
     comment: schemas.CommentCreate,
-    conn: asyncpg.Connection = Depends(get_db_connection),
+    conn: AsyncConnection = Depends(get_db_connection),
     current_user: dict = Depends(auth_utils.get_current_active_user)  # Any authenticated user
 ):
     """Add a comment to a video. Accessible by any authenticated user."""
-    db_video = await crud.get_video(conn, video_id=video_id)
-    if db_video is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
-    
+    # One atomic statement; a missing video surfaces as None from its foreign key
     db_comment = await crud.create_comment(
         conn, 
         text=comment.text, 
         owner_id=current_user["id"],  # Dictionary access
         video_id=video_id
     )
+    if db_comment is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
     return schemas.Comment(**db_comment)
 
 @router.get("/{video_id}/comments", response_model=List[dict])
 async def list_comments_for_video(
     video_id: int,
-    conn: asyncpg.Connection = Depends(get_db_connection),
-    skip: int = 0,
+    response: Response,
+    conn: AsyncConnection = Depends(get_db_connection),
+    cursor: Optional[str] = None,
     limit: int = 10,
     current_user: dict = Depends(auth_utils.get_current_active_user)  # Any authenticated user
 ):
     """List comments for a specific video. Accessible by any authenticated user."""
-    db_video = await crud.get_video(conn, video_id=video_id)
-    if db_video is None:
+    after_ts, after_id = pagination.decode_cursor(cursor)
+    comments = await crud.get_comments_for_video(
+        conn, video_id=video_id, after_ts=after_ts, after_id=after_id, limit=limit
+    )
+    if comments is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
 
-    comments = await crud.get_comments_for_video(conn, video_id=video_id, skip=skip, limit=limit)
+    pagination.set_next_cursor(response, comments, limit, "created_at")
     # Note: comments already include username from the JOIN in crud.py
     return comments
 
@@ -133,7 +129,7 @@ async def list_comments_for_video(
 async def add_or_update_rating_for_video(
     video_id: int,
     rating: schemas.RatingCreate,
-    conn: asyncpg.Connection = Depends(get_db_connection),
+    conn: AsyncConnection = Depends(get_db_connection),
     current_user: dict = Depends(auth_utils.get_current_active_user)  # Any authenticated user
 ):
     """Add or update a rating for a video. Accessible by any authenticated user."""
@@ -143,48 +139,47 @@ async def add_or_update_rating_for_video(
             detail="Rating score must be between 1.0 and 5.0"
         )
     
-    db_video = await crud.get_video(conn, video_id=video_id)
-    if db_video is None:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
-    
+    # One atomic statement; a missing video surfaces as None from its foreign key
     db_rating = await crud.create_or_update_rating(
         conn, 
         score=rating.score, 
         owner_id=current_user["id"],  # Dictionary access
         video_id=video_id
     )
+    if db_rating is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
     return schemas.Rating(**db_rating)
 
 @router.get("/{video_id}/ratings/average")
 async def get_video_average_rating(
     video_id: int,
-    conn: asyncpg.Connection = Depends(get_db_connection),
+    conn: AsyncConnection = Depends(get_db_connection),
     current_user: dict = Depends(auth_utils.get_current_active_user)
 ):
     """Get average rating for a video. Accessible by any authenticated user."""
-    db_video = await crud.get_video(conn, video_id=video_id)
-    if db_video is None:
+    stats = await crud.get_rating_stats_for_video(conn, video_id)
+    if stats is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
     
-    avg_rating = await crud.get_average_rating_for_video(conn, video_id)
-    return {
+    # Flat numeric payload: hand it to orjson directly, skipping jsonable_encoder
+    return ORJSONResponse({
         "video_id": video_id,
-        "average_rating": avg_rating
-    }
+        "average_rating": stats["avg_score"]
+    })
 
 @router.get("/{video_id}/ratings/stats")
 async def get_video_rating_stats(
     video_id: int,
-    conn: asyncpg.Connection = Depends(get_db_connection),
+    conn: AsyncConnection = Depends(get_db_connection),
     current_user: dict = Depends(auth_utils.get_current_active_user)
 ):
     """Get comprehensive rating statistics for a video. Accessible by any authenticated user."""
-    db_video = await crud.get_video(conn, video_id=video_id)
-    if db_video is None:
+    stats = await crud.get_rating_stats_for_video(conn, video_id)
+    if stats is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Video not found")
     
-    stats = await crud.get_rating_stats_for_video(conn, video_id)
-    return {
+    # Flat numeric payload: hand it to orjson directly, skipping jsonable_encoder
+    return ORJSONResponse({
         "video_id": video_id,
         **stats
-    }
\ No newline at end of file
+    })
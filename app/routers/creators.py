@@ -1,13 +1,29 @@
 # routers/creators.py
-from fastapi import APIRouter, Depends, Form, status, UploadFile, File
-import asyncpg
+from fastapi import APIRouter, Depends, Form, HTTPException, Response, status, UploadFile, File
+from psycopg import AsyncConnection
 from typing import List, Optional
 
-from app import crud, schemas, auth_utils, blob_storage
+from app import crud, schemas, auth_utils, blob_storage, pagination
 from app.database import get_db_connection
+from app.config import (
+    ALLOWED_THUMBNAIL_TYPES,
+    ALLOWED_VIDEO_TYPES,
+    MAX_THUMBNAIL_UPLOAD_BYTES,
+    MAX_VIDEO_UPLOAD_BYTES
+)
 
 router = APIRouter()
 
+def _check_upload(file: UploadFile, allowed_types: frozenset, max_bytes: int):
+    """Cheap up-front checks on an upload: declared MIME type and (when known) its size"""
+    if file.content_type not in allowed_types:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported file type '{file.content_type}'. Allowed: {', '.join(sorted(allowed_types))}"
+        )
+    if file.size is not None and file.size > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="File too large")
+
 @router.post("/", response_model=schemas.Video, status_code=status.HTTP_201_CREATED,
              dependencies=[Depends(auth_utils.require_creator)])
 async def upload_video(
@@ -16,22 +32,32 @@ async def upload_video(
     description: Optional[str] = None,
     thumbnail: Optional[UploadFile] = File(None),
     current_user: dict = Depends(auth_utils.get_current_active_user),
-    conn: asyncpg.Connection = Depends(get_db_connection)
+    conn: AsyncConnection = Depends(get_db_connection)
 ):
     """Upload a video file and its metadata. Requires 'creator' role."""
-    # Upload video to blob storage
-    video_blob_url = await blob_storage.upload_file_to_blob(file, file_type="video")
+    # Reject bad files before anything is sent to Azure
+    _check_upload(file, ALLOWED_VIDEO_TYPES, MAX_VIDEO_UPLOAD_BYTES)
+    if thumbnail:
+        _check_upload(thumbnail, ALLOWED_THUMBNAIL_TYPES, MAX_THUMBNAIL_UPLOAD_BYTES)
+
+    # Upload video to blob storage; the byte cap is enforced again while streaming
+    video_blob_name = await blob_storage.upload_file_to_blob(
+        file, file_type="video", max_bytes=MAX_VIDEO_UPLOAD_BYTES
+    )
     
     thumbnail_blob_url = None
     if thumbnail:
-        # Upload thumbnail to blob storage
-        thumbnail_blob_url = await blob_storage.upload_file_to_blob(thumbnail, file_type="thumbnail")
-    print("got here")
+        # Upload thumbnail to blob storage; clients load it directly, so keep its URL
+        thumbnail_blob_name = await blob_storage.upload_file_to_blob(
+            thumbnail, file_type="thumbnail", max_bytes=MAX_THUMBNAIL_UPLOAD_BYTES
+        )
+        thumbnail_blob_url = await blob_storage.get_blob_url(thumbnail_blob_name)
+    # A single INSERT is atomic on its own; no explicit transaction needed
     db_video = await crud.create_video(
         conn=conn,
         title=title,
         description=description,
-        blob_url=video_blob_url,
+        blob_url=video_blob_name,
         owner_id=current_user["id"],  # Access dict key instead of attribute
         thumbnail_url=thumbnail_blob_url
     )
@@ -41,10 +67,18 @@ async def upload_video(
              dependencies=[Depends(auth_utils.require_creator)])
 async def list_creator_videos(
     current_user: dict = Depends(auth_utils.get_current_active_user),
-    conn: asyncpg.Connection = Depends(get_db_connection),
-    skip: int = 0,
+    conn: AsyncConnection = Depends(get_db_connection),
+    cursor: Optional[str] = None,
     limit: int = 10
 ):
     """List videos uploaded by the current creator. Requires 'creator' role."""
-    videos = await crud.get_creator_videos(conn, owner_id=current_user["id"], skip=skip, limit=limit)
-    return [schemas.Video(**video) for video in videos]
\ No newline at end of file
+    after_ts, after_id = pagination.decode_cursor(cursor)
+    videos = await crud.get_creator_videos(
+        conn, owner_id=current_user["id"], after_ts=after_ts, after_id=after_id, limit=limit
+    )
+    # Rows come from our own query in the schema's shape; skip re-validating them field by field
+    page = [schemas.Video.model_construct(**video) for video in videos]
+    # Serialized by the precompiled adapter; returning a Response bypasses the response_model pass
+    response = Response(schemas.VIDEO_LIST_ADAPTER.dump_json(page), media_type="application/json")
+    pagination.set_next_cursor(response, videos, limit, "upload_timestamp")
+    return response
@@ -1,7 +1,7 @@
 # schemas.py
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, ConfigDict, EmailStr, TypeAdapter
 from datetime import datetime
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 
 # --- User Schemas ---
 class UserBase(BaseModel):
@@ -15,8 +15,7 @@ class User(UserBase):
     id: int
     role: str
 
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 class UserInDB(User):
     hashed_password: str
@@ -29,20 +28,6 @@ class VideoBase(BaseModel):
 class VideoCreate(VideoBase):
     pass # For now, no extra fields needed for creation beyond base
 
-# class Video(VideoBase):
-#     id: int
-#     blob_url: str
-#     thumbnail_url: Optional[str] = None
-#     stream_url: Optional[str] = None
-#     upload_timestamp: datetime
-#     owner_id: int
-
-#     class Config:
-#         from_attributes = True
-#         json_encoders = {
-#             datetime: lambda v: v.isoformat(timespec='milliseconds')
-#         }
-
 class Video(BaseModel):
     id: int
     title: str
@@ -57,12 +42,10 @@ class Video(BaseModel):
     created_at: Optional[datetime] = None
     owner: Optional[Dict[str, str]] = None   # {"username": "..."}
 
-    class Config:
-        orm_mode = True
-        # Ensures datetime fields are serialized in milliseconds for JS
-        json_encoders = {
-            datetime: lambda v: v.isoformat(timespec="milliseconds")
-        }
+    model_config = ConfigDict(from_attributes=True)
+
+# Compiled once at import; list endpoints serialize pages with it directly to JSON bytes
+VIDEO_LIST_ADAPTER = TypeAdapter(List[Video])
 
 # --- Comment Schemas ---
 class CommentBase(BaseModel):
@@ -71,14 +54,6 @@ class CommentBase(BaseModel):
 class CommentCreate(CommentBase):
     pass
 
-# class Comment(CommentBase):
-#     id: int
-#     timestamp: datetime
-#     owner_id: int
-#     video_id: int
-
-#     class Config:
-#         from_attributes = True
 class Comment(BaseModel):
     id: int
     content: str
@@ -87,9 +62,7 @@ class Comment(BaseModel):
     created_at: datetime
     owner: Optional[Dict[str, str]] = None
 
-    class Config:
-        orm_mode = True
-        json_encoders = {datetime: lambda v: v.isoformat(timespec="milliseconds")}
+    model_config = ConfigDict(from_attributes=True)
 
 # --- Rating Schemas ---
 class RatingBase(BaseModel):
@@ -105,9 +78,21 @@ class Rating(BaseModel):
     owner_id: int
     created_at: datetime
 
-    class Config:
-        orm_mode = True
-        json_encoders = {datetime: lambda v: v.isoformat(timespec="milliseconds")}
+    model_config = ConfigDict(from_attributes=True)
+
+
+class RatingStats(BaseModel):
+    avg_score: float
+    total_ratings: int
+    min_score: float
+    max_score: float
+
+
+# --- Video Detail Schemas ---
+class VideoDetail(BaseModel):
+    video: Video
+    comments: List[Comment]
+    rating_stats: RatingStats
 
 
 # --- Auth Schemas ---
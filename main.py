@@ -1,37 +1,57 @@
 # main.py
 import uvicorn
 import os
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
+from psycopg_pool import PoolTimeout
 from app.database import startup_database, shutdown_database
+from app.blob_storage import startup_blob_storage, shutdown_blob_storage
+from app.config import CORS_ALLOW_ORIGINS
+from app.pagination import NEXT_CURSOR_HEADER
 from app.routers import auth, creators, consumers, admin
 
-# Create database tables
-# models.Base.metadata.create_all(bind=engine)
+try:
+    # libuv-based event loop: cheaper awaits and task scheduling than the default selector loop
+    import uvloop
+    uvloop.install()
+except ImportError:  # uvloop has no Windows build
+    pass
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     await startup_database()
+    await startup_blob_storage()
     yield
 
+    await shutdown_blob_storage()
     await shutdown_database()
 
 app = FastAPI(
     title="Video Platform API",
     description="A video platform with Azure PostgreSQL backend",
     version="2.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],          # or ["*"] to allow all
+    allow_origins=CORS_ALLOW_ORIGINS,   # explicit list, set via the CORS_ALLOW_ORIGINS env var
     allow_credentials=False,
-    allow_methods=["*"],            # GET, POST, PUT, DELETE, etc.
-    allow_headers=["*"],            # Allow all headers
+    allow_methods=["GET", "POST"],     # the only methods the API serves
+    allow_headers=["Authorization", "Content-Type"],
+    expose_headers=[NEXT_CURSOR_HEADER],  # Let browsers read the pagination cursor
+    max_age=600,                    # let browsers reuse preflight results for 10 minutes
 )
 
+@app.exception_handler(PoolTimeout)
+async def pool_timeout_handler(request: Request, exc: PoolTimeout):
+    # Every pooled connection stayed busy for DB_POOL_TIMEOUT; tell the client to back off
+    return ORJSONResponse(status_code=503, content={"detail": "Database busy, please retry"})
+
 # Include routers
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(creators.router, prefix="/videos", tags=["Creators"]) # This path also serves general video uploads
@@ -42,3 +62,14 @@ app.include_router(admin.router, prefix="/admin", tags=["Admin"])
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Video Sharing Platform API"}
+
+
+if __name__ == "__main__":
+    uvicorn.run(
+        app,
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        # "auto" picks uvloop/httptools when installed and falls back otherwise (e.g. on Windows)
+        loop="auto",
+        http="auto",
+    )